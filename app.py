@@ -2,8 +2,9 @@ import streamlit as st
 import json
 import time
 import os
-import requests
 from dotenv import load_dotenv
+from profiler import PhaseTimer, ScriptProfiler
+import transport
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +16,17 @@ st.set_page_config(
     layout="wide"
 )
 
+# Phase timing and script profiling are switched on from the sidebar
+phase_timer = PhaseTimer(enabled=st.session_state.get("profile_phases", False))
+script_profiler = None
+profiler_busy = False
+if phase_timer.enabled and st.session_state.get("profile_script"):
+    script_profiler = ScriptProfiler(st.session_state.get("profile_backend", "cProfile"))
+    if not script_profiler.start():
+        # Another session holds the process-wide profiler
+        script_profiler = None
+        profiler_busy = True
+
 # Initialize session state
 if 'api_key' not in st.session_state:
     st.session_state.api_key = os.getenv("RUNPOD_API_KEY")
@@ -50,10 +62,43 @@ def display_stats():
             st.metric("Output", st.session_state.stats["output_tokens"])
         st.metric("Total Tokens", st.session_state.stats["total_tokens"])
         
+        # Profiling controls
+        st.write("#### 🧪 Profiling")
+        st.toggle("Phase timing", key="profile_phases", help="Break each response down into client-side and server phases")
+        st.toggle(
+            "Profile script run",
+            key="profile_script",
+            disabled=not st.session_state.get("profile_phases", False),
+            help="Capture a cProfile/pyinstrument profile of the run that handles the next question"
+        )
+        st.selectbox("Profiler", ["cProfile", "pyinstrument"], key="profile_backend")
+        if profiler_busy:
+            st.warning("Profiler busy: another session is already profiling. Try again shortly.")
+        
         # Debug information
         with st.expander("🔍 Debug Info"):
             st.write("Raw stats:")
             st.json(st.session_state.stats)
+            if st.session_state.get("phase_breakdown"):
+                st.write("Phase breakdown (ms):")
+                st.table(st.session_state.phase_breakdown)
+            capture = st.session_state.get("profile_capture")
+            if capture:
+                st.write("Script profile:")
+                st.download_button(
+                    "Download profile",
+                    data=capture["data"],
+                    file_name=capture["file_name"],
+                    mime=capture["mime"]
+                )
+                st.code(capture["summary"])
+
+def save_profiling():
+    """Keep the phase breakdown and profile of this run for the debug panel"""
+    if phase_timer.enabled:
+        st.session_state.phase_breakdown = phase_timer.breakdown()
+    if script_profiler is not None and script_profiler.running:
+        st.session_state.profile_capture = script_profiler.stop()
 
 # Display stats initially
 display_stats()
@@ -96,14 +141,19 @@ if st.session_state.api_key:
                     }
                 }
                 
+                # Live, recording or replaying session depending on RUNPOD_TRANSPORT
+                http = transport.requests_session()
+                
                 # Make the request
-                response = requests.post(
-                    'https://api.runpod.ai/v2/tzwg1ryfn03n0t/run',
-                    headers=headers,
-                    json=data
-                )
+                with phase_timer.span("submit"):
+                    response = http.post(
+                        'https://api.runpod.ai/v2/tzwg1ryfn03n0t/run',
+                        headers=headers,
+                        json=data
+                    )
                 
-                result = response.json()
+                with phase_timer.span("parse"):
+                    result = response.json()
                 
                 if "error" in result:
                     full_response = f"Error: {result['error']}\nRaw response: {result.get('raw_response', 'No raw response')}"
@@ -113,11 +163,13 @@ if st.session_state.api_key:
                     job_id = result["id"]
                     # Check status until completed
                     while True:
-                        status_response = requests.get(
-                            f'https://api.runpod.ai/v2/tzwg1ryfn03n0t/status/{job_id}',
-                            headers=headers
-                        )
-                        status = status_response.json()
+                        with phase_timer.span("poll"):
+                            status_response = http.get(
+                                f'https://api.runpod.ai/v2/tzwg1ryfn03n0t/status/{job_id}',
+                                headers=headers
+                            )
+                        with phase_timer.span("parse"):
+                            status = status_response.json()
                         
                         if "error" in status:
                             full_response = f"Error checking status: {status['error']}\nRaw response: {status.get('raw_response', 'No raw response')}"
@@ -126,6 +178,10 @@ if st.session_state.api_key:
                         current_status = status.get("status")
                         
                         if current_status == "COMPLETED":
+                            # Server-side queue and execution time as reported by RunPod
+                            phase_timer.record("server_queue", status.get("delayTime", 0))
+                            phase_timer.record("server_execution", status.get("executionTime", 0))
+                            
                             # Get the output data
                             output = status.get("output", [])
                             if isinstance(output, list) and len(output) > 0:
@@ -170,12 +226,14 @@ if st.session_state.api_key:
                                 full_response = full_response.strip()
                                 
                                 # Update the placeholder with the full response
-                                message_placeholder.write(full_response)
+                                with phase_timer.span("render"):
+                                    message_placeholder.write(full_response)
                                 
                                 # Add assistant response to chat history
                                 st.session_state.chat_history.append({"role": "assistant", "content": full_response})
                                 
                                 # Force sidebar refresh for stats
+                                save_profiling()
                                 st.experimental_rerun()
                             else:
                                 full_response = "No output received from the model"
@@ -188,10 +246,12 @@ if st.session_state.api_key:
                             break
                         
                         message_placeholder.write(f"Thinking... (Status: {current_status})")
-                        time.sleep(2)
+                        with phase_timer.span("poll_wait"):
+                            transport.sleep(2)
                 
                 # Update the placeholder with the full response
-                message_placeholder.write(full_response)
+                with phase_timer.span("render"):
+                    message_placeholder.write(full_response)
                 
                 # Add assistant response to chat history
                 st.session_state.chat_history.append({"role": "assistant", "content": full_response})
@@ -200,5 +260,11 @@ if st.session_state.api_key:
                 error_message = f"An error occurred: {str(e)}"
                 message_placeholder.write(error_message)
                 st.session_state.chat_history.append({"role": "assistant", "content": error_message})
+            
+            save_profiling()
 else:
-    st.error("API key not found in .env file. Please create a .env file with your RUNPOD_API_KEY.") 
\ No newline at end of file
+    st.error("API key not found in .env file. Please create a .env file with your RUNPOD_API_KEY.")
+
+# Runs that didn't handle a question aren't worth keeping
+if script_profiler is not None and script_profiler.running:
+    script_profiler.stop() 
\ No newline at end of file
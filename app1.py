@@ -3,9 +3,16 @@ from openai import OpenAI
 import os
 import json
 import time
+import logging
 from dotenv import load_dotenv
+from semantic_cache import cache_from_env, standalone_question
+from profiler import PhaseTimer, ScriptProfiler, NULL_TIMER, TRACED_PHASES, trace_hooks
+from structured_logging import get_logger, log_event, new_request_id, should_capture_payload
+from transport import httpx_client
 load_dotenv()
 
+logger = get_logger()
+
 # Set page config
 st.set_page_config(
     page_title="RunPod Chat Interface",
@@ -13,6 +20,17 @@ st.set_page_config(
     layout="wide"
 )
 
+# Phase timing and script profiling are switched on from the sidebar
+phase_timer = PhaseTimer(enabled=st.session_state.get("profile_phases", False))
+script_profiler = None
+profiler_busy = False
+if phase_timer.enabled and st.session_state.get("profile_script"):
+    script_profiler = ScriptProfiler(st.session_state.get("profile_backend", "cProfile"))
+    if not script_profiler.start():
+        # Another session holds the process-wide profiler
+        script_profiler = None
+        profiler_busy = True
+
 # Initialize session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
@@ -25,9 +43,17 @@ if 'stats' not in st.session_state:
         "completion_tokens": 0,
         "total_tokens": 0,
         "model_name": os.getenv("MODEL_NAME", "Not set"),
-        "last_response": ""
+        "last_response": "",
+        "cache_hit": False
     }
 
+@st.cache_resource
+def get_semantic_cache(model_name):
+    """
+    Shared semantic cache of past answers for a model, persisted across sessions and restarts
+    """
+    return cache_from_env(model_name or "")
+
 def validate_environment():
     """Validate environment variables are set correctly"""
     token = os.getenv("RUNPOD_TOKEN")
@@ -68,19 +94,70 @@ def format_prompt(messages):
     formatted_text += "Assistant: "
     return formatted_text
 
-def get_chatbot_response(client, model_name, messages, temperature=0.7):
+def get_chatbot_response(client, model_name, messages, temperature=0.7, cache=None, timer=NULL_TIMER):
     """
-    Get streaming response from the RunPod endpoint using OpenAI compatibility layer
+    Get streaming response from the RunPod endpoint using OpenAI compatibility layer.
+    When a semantic cache is given, near-duplicate questions are answered from it.
+    Phase durations are recorded on `timer` when it is enabled.
     """
+    request_id = new_request_id()
+    capture_payload = should_capture_payload()
     try:
         # Record start time
         start_time = time.time()
         
         # Format the prompt
-        formatted_prompt = format_prompt(messages)
-        print("Debug - Formatted prompt:", formatted_prompt)
+        with timer.span("format_prompt"):
+            formatted_prompt = format_prompt(messages)
+        log_event(
+            logger,
+            "completion_request",
+            request_id=request_id,
+            model=model_name,
+            messages=len(messages),
+            prompt_chars=len(formatted_prompt),
+            prompt=formatted_prompt if capture_payload else None
+        )
+        
+        # Serve near-duplicate questions from the semantic cache; follow-ups are never cached
+        question = standalone_question(messages)
+        if cache is not None and question:
+            with timer.span("cache_lookup"):
+                cached_response = cache.lookup(question)
+            if cached_response is not None:
+                with timer.span("render"):
+                    st.empty().markdown(cached_response)
+                prompt_tokens = len(formatted_prompt.split())
+                completion_tokens = len(cached_response.split())
+                execution_time = int((time.time() - start_time) * 1000)
+                st.session_state.stats.update({
+                    "execution_time": execution_time,
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "model_name": model_name,
+                    "last_response": cached_response,
+                    "cache_hit": True,
+                    "request_id": request_id
+                })
+                log_event(
+                    logger,
+                    "completion_done",
+                    request_id=request_id,
+                    execution_ms=execution_time,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens,
+                    response_chars=len(cached_response),
+                    cache_hit=True,
+                    response=cached_response if capture_payload else None
+                )
+                return cached_response
         
-        # Create a completion with streaming enabled
+        # Create a completion with streaming enabled. create() returns once the response
+        # headers are in, so the traced connect/TLS/send/server wait phases happen inside
+        # it; only the rest of its time is recorded, as request_overhead
+        traced_before = sum(timer.total(phase) for phase in TRACED_PHASES)
+        request_start = time.perf_counter()
         response_stream = client.completions.create(
             model=model_name,
             prompt=formatted_prompt,
@@ -92,6 +169,10 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
             stop=["Human:", "\n\n"],
             stream=True  # Enable streaming
         )
+        if timer.enabled:
+            request_ms = (time.perf_counter() - request_start) * 1000
+            traced_ms = sum(timer.total(phase) for phase in TRACED_PHASES) - traced_before
+            timer.record("request_overhead", max(request_ms - traced_ms, 0.0))
         
         # Initialize the placeholder for streaming text
         response_placeholder = st.empty()
@@ -99,32 +180,47 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
         collected_messages = []
         full_response = ""
         
-        # Process the streaming response
+        # Process the streaming response; the headers are already in, so this times the body
+        stream_start = time.perf_counter()
+        waiting_for_first_chunk = True
         for chunk in response_stream:
-            if hasattr(chunk, 'model_dump'):
-                chunk_dict = chunk.model_dump()
-            elif isinstance(chunk, dict):
-                chunk_dict = chunk
-            else:
-                chunk_dict = json.loads(str(chunk))
+            if waiting_for_first_chunk:
+                timer.record("first_chunk", (time.perf_counter() - stream_start) * 1000)
+                waiting_for_first_chunk = False
             
-            collected_chunks.append(chunk_dict)
-            chunk_message = ""
+            with timer.span("chunk_parsing"):
+                if hasattr(chunk, 'model_dump'):
+                    chunk_dict = chunk.model_dump()
+                elif isinstance(chunk, dict):
+                    chunk_dict = chunk
+                else:
+                    chunk_dict = json.loads(str(chunk))
+                
+                collected_chunks.append(chunk_dict)
+                chunk_message = ""
+                
+                if 'choices' in chunk_dict and chunk_dict['choices']:
+                    choice = chunk_dict['choices'][0]
+                    if isinstance(choice, dict):
+                        if 'text' in choice:
+                            chunk_message = choice['text']
+                        elif 'delta' in choice and 'content' in choice['delta']:
+                            chunk_message = choice['delta']['content']
+                
+                collected_messages.append(chunk_message)
+                full_response = ''.join(collected_messages)
             
-            if 'choices' in chunk_dict and chunk_dict['choices']:
-                choice = chunk_dict['choices'][0]
-                if isinstance(choice, dict):
-                    if 'text' in choice:
-                        chunk_message = choice['text']
-                    elif 'delta' in choice and 'content' in choice['delta']:
-                        chunk_message = choice['delta']['content']
-            
-            collected_messages.append(chunk_message)
-            full_response = ''.join(collected_messages)
-            response_placeholder.markdown(full_response + "▌")
+            with timer.span("render"):
+                response_placeholder.markdown(full_response + "▌")
+        
+        # Time spent waiting on the network between chunks
+        if timer.enabled:
+            stream_ms = (time.perf_counter() - stream_start) * 1000
+            timer.record("stream_wait", stream_ms - timer.total("first_chunk") - timer.total("chunk_parsing") - timer.total("render"))
         
         # Replace the blinking cursor with the final response
-        response_placeholder.markdown(full_response)
+        with timer.span("render"):
+            response_placeholder.markdown(full_response)
         
         # Calculate execution time
         execution_time = int((time.time() - start_time) * 1000)
@@ -140,14 +236,33 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
             "completion_tokens": completion_tokens,
             "total_tokens": prompt_tokens + completion_tokens,
             "model_name": model_name,
-            "last_response": full_response
+            "last_response": full_response,
+            "cache_hit": False,
+            "request_id": request_id
         })
+        log_event(
+            logger,
+            "completion_done",
+            request_id=request_id,
+            execution_ms=execution_time,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            response_chars=len(full_response),
+            chunks=len(collected_chunks),
+            cache_hit=False,
+            response=full_response if capture_payload else None
+        )
+        
+        # Remember the answer for similar questions
+        if cache is not None and question and full_response.strip():
+            with timer.span("cache_store"):
+                cache.add(question, full_response)
         
         return full_response
             
     except Exception as e:
         error_msg = str(e)
-        print(f"Debug - Error in get_chatbot_response: {error_msg}")
+        log_event(logger, "completion_error", level=logging.ERROR, request_id=request_id, error=error_msg)
         st.error(f"Error: {error_msg}")
         
         # Update stats even in case of error
@@ -157,7 +272,9 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
             "completion_tokens": 0,
             "total_tokens": len(formatted_prompt.split()),
             "model_name": model_name,
-            "last_response": f"Error: {error_msg}"
+            "last_response": f"Error: {error_msg}",
+            "cache_hit": False,
+            "request_id": request_id
         })
         
         return f"Error: {error_msg}"
@@ -172,11 +289,11 @@ def get_available_models(client):
     except Exception as e:
         error_msg = str(e)
         if "401" in error_msg:
-            print("Authentication failed. Please check your RunPod API token.")
+            log_event(logger, "models_error", level=logging.ERROR, error="Authentication failed. Please check your RunPod API token.")
         elif "404" in error_msg:
-            print("Endpoint not found. Please check your RUNPOD_ENDPOINT_ID.")
+            log_event(logger, "models_error", level=logging.ERROR, error="Endpoint not found. Please check your RUNPOD_ENDPOINT_ID.")
         else:
-            print(f"Error getting models: {error_msg}")
+            log_event(logger, "models_error", level=logging.ERROR, error=error_msg)
         return []
 
 # Sidebar with stats
@@ -226,6 +343,42 @@ with st.sidebar:
         help="Total number of tokens used"
     )
     
+    # Semantic cache information
+    semantic_cache = get_semantic_cache(os.getenv("MODEL_NAME"))
+    if semantic_cache is not None:
+        st.write("#### 🧠 Semantic Cache")
+        cache_stats = semantic_cache.stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(
+                "Hit Rate",
+                value=f"{cache_stats['hit_rate']:.0%}",
+                delta=None,
+                help=f"{cache_stats['hits']} hits out of {cache_stats['lookups']} lookups"
+            )
+        with col2:
+            st.metric(
+                "Lookup",
+                value=f"{cache_stats['last_lookup_ms']:.2f}ms",
+                delta=None,
+                help=f"Average lookup latency: {cache_stats['avg_lookup_ms']:.2f}ms"
+            )
+        if st.session_state.stats.get('cache_hit'):
+            st.caption("Last response was served from the cache")
+    
+    # Profiling controls
+    st.write("#### 🧪 Profiling")
+    st.toggle("Phase timing", key="profile_phases", help="Break each response down into client-side phases")
+    st.toggle(
+        "Profile script run",
+        key="profile_script",
+        disabled=not st.session_state.get("profile_phases", False),
+        help="Capture a cProfile/pyinstrument profile of the run that handles the next question"
+    )
+    st.selectbox("Profiler", ["cProfile", "pyinstrument"], key="profile_backend")
+    if profiler_busy:
+        st.warning("Profiler busy: another session is already profiling. Try again shortly.")
+    
     # Debug information
     with st.expander("🔍 Debug Info", expanded=True):
         st.write("**Raw stats:**")
@@ -236,6 +389,22 @@ with st.sidebar:
         st.write("**Session State:**")
         st.write("- Stats initialized:", 'stats' in st.session_state)
         st.write("- Chat history length:", len(st.session_state.chat_history))
+        if semantic_cache is not None:
+            st.write("**Semantic Cache:**")
+            st.json(semantic_cache.stats())
+        if st.session_state.get("phase_breakdown"):
+            st.write("**Phase Breakdown (ms):**")
+            st.table(st.session_state.phase_breakdown)
+        capture = st.session_state.get("profile_capture")
+        if capture:
+            st.write("**Script Profile:**")
+            st.download_button(
+                "Download profile",
+                data=capture["data"],
+                file_name=capture["file_name"],
+                mime=capture["mime"]
+            )
+            st.code(capture["summary"])
 
 # Main chat interface
 st.title("🤖 RunPod Chat Interface")
@@ -245,11 +414,16 @@ endpoint_id = os.getenv("RUNPOD_ENDPOINT_ID")
 base_url = f"https://api.runpod.ai/v2/{endpoint_id}/openai/v1"
 
 try:
-    client = OpenAI(
-        api_key=os.getenv("RUNPOD_TOKEN"),
-        base_url=base_url
-    )
-    print(f"Debug - OpenAI client initialized with base_url: {base_url}")
+    with phase_timer.span("client_init"):
+        # Trace connect, TLS and server wait through httpx when timing is on,
+        # and record or replay traffic as RUNPOD_TRANSPORT asks
+        http_client = httpx_client(event_hooks=trace_hooks(phase_timer) if phase_timer.enabled else None)
+        client = OpenAI(
+            api_key=os.getenv("RUNPOD_TOKEN"),
+            base_url=base_url,
+            http_client=http_client
+        )
+    log_event(logger, "client_initialized", level=logging.DEBUG, base_url=base_url)
 except Exception as e:
     st.error(f"Failed to initialize OpenAI client: {str(e)}")
     client = None
@@ -281,10 +455,26 @@ if prompt := st.chat_input("What would you like to ask?"):
         
         # Get model response with streaming
         with st.chat_message("assistant"):
-            response = get_chatbot_response(client, os.getenv("MODEL_NAME"), messages)
+            response = get_chatbot_response(
+                client,
+                os.getenv("MODEL_NAME"),
+                messages,
+                cache=get_semantic_cache(os.getenv("MODEL_NAME")),
+                timer=phase_timer
+            )
         
         # Add assistant response to chat history
         st.session_state.chat_history.append({"role": "assistant", "content": response})
         
+        # Keep the phase breakdown and profile of this run for the debug panel
+        if phase_timer.enabled:
+            st.session_state.phase_breakdown = phase_timer.breakdown()
+        if script_profiler is not None:
+            st.session_state.profile_capture = script_profiler.stop()
+        
         # Force a rerun to update the sidebar
-        st.experimental_rerun() 
\ No newline at end of file
+        st.experimental_rerun()
+
+# Runs that didn't handle a question aren't worth keeping
+if script_profiler is not None and script_profiler.running:
+    script_profiler.stop() 
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Startup benchmark for the CLIs.
+
+Runs each command several times and reports the median wall time, then runs
+it once more under `python -X importtime` to show which imports dominate.
+Besides the `--help` paths, the fast-start target runs a full
+`with_OPenai-New.py --fast --prompt ...` request, including the openai import
+and the cached-config check, against a replay cassette from the transport
+package (RUNPOD_TRANSPORT=replay, RUNPOD_REPLAY_SPEED=0), so no network is
+needed. Use --json to append the results to a JSON lines file and track them
+across releases:
+
+    python bench_startup.py --runs 10 --json startup_history.jsonl
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OPENAI_CLI = os.path.join(HERE, "with_OPenai-New.py")
+
+# Settings for the replayed fast-start request
+FAST_TOKEN = "rp_bench"
+FAST_ENDPOINT = "bench"
+FAST_MODEL = "bench-model"
+FAST_PROMPT = "What is the capital of Italy?"
+FAST_ANSWER = "Rome"
+
+# name -> (arguments, text the command must print to count as a successful run)
+TARGETS = {
+    "interpreter": (["-c", "pass"], None),
+    "with_OPenai-New --help": ([OPENAI_CLI, "--help"], None),
+    "with_OPenai-New --fast (replay)": ([OPENAI_CLI, "--fast", "--prompt", FAST_PROMPT], f"Response: {FAST_ANSWER}"),
+    "runpod_example --help": ([os.path.join(HERE, "runpod_example.py"), "--help"], None)
+}
+
+
+def prepare_fast_replay(directory):
+    """
+    Record the fast-start request against a mock backend into a cassette and
+    cache a matching validation, returning the environment that replays it
+    """
+    import importlib.util
+    import httpx
+    from openai import OpenAI
+    from transport.cassette import Cassette
+    from transport.httpx_transport import RecordingTransport
+
+    env = {
+        "RUNPOD_TRANSPORT": "replay",
+        "RUNPOD_REPLAY_SPEED": "0",
+        "RUNPOD_CASSETTE": os.path.join(directory, "fast_start.json"),
+        "RUNPOD_CONFIG_CACHE": os.path.join(directory, "config.json"),
+        "RUNPOD_TOKEN": FAST_TOKEN,
+        "RUNPOD_ENDPOINT_ID": FAST_ENDPOINT,
+        "MODEL_NAME": FAST_MODEL,
+        "LOG_LEVEL": "WARNING"
+    }
+    os.environ["RUNPOD_CONFIG_CACHE"] = env["RUNPOD_CONFIG_CACHE"]
+    from fast_start import save_cached_config
+    save_cached_config(FAST_TOKEN, FAST_ENDPOINT, FAST_MODEL, [FAST_MODEL])
+
+    def completion(request):
+        return httpx.Response(200, json={
+            "id": "bench", "object": "text_completion", "created": 0, "model": FAST_MODEL,
+            "choices": [{"index": 0, "text": f" {FAST_ANSWER}", "finish_reason": "stop", "logprobs": None}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        })
+
+    # Send exactly what the CLI sends, by going through its own request code
+    spec = importlib.util.spec_from_file_location("openai_cli", OPENAI_CLI)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+    cassette = Cassette(env["RUNPOD_CASSETTE"], load=False)
+    client = OpenAI(
+        api_key=FAST_TOKEN,
+        base_url=f"https://api.runpod.ai/v2/{FAST_ENDPOINT}/openai/v1",
+        http_client=httpx.Client(transport=RecordingTransport(cassette, httpx.MockTransport(completion)))
+    )
+    messages = [
+        {"role": "system", "content": cli.SYSTEM_PROMPT},
+        {"role": "user", "content": FAST_PROMPT}
+    ]
+    cli.get_chatbot_response(client, FAST_MODEL, messages)
+    cassette.flush()
+    return env
+
+
+def run_once(args, importtime=False, env=None, expect=None):
+    """Run one Python command, returning its wall time in ms and its stderr"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    start = time.perf_counter()
+    result = subprocess.run(
+        command, cwd=HERE, capture_output=True, text=True,
+        env=dict(os.environ, **env) if env else None
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {result.returncode}:\n{result.stderr}")
+    if expect is not None and expect not in result.stdout:
+        raise RuntimeError(f"{' '.join(command)} didn't print {expect!r}:\n{result.stdout}")
+    return elapsed, result.stderr
+
+
+def parse_importtime(stderr):
+    """Top-level imports from -X importtime output as (module, cumulative ms), slowest first"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented further under the module that pulled them in
+        if len(name) - len(name.lstrip()) > 1:
+            continue
+        imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def benchmark(name, args, runs, top, env=None, expect=None):
+    timings = [run_once(args, env=env, expect=expect)[0] for _ in range(runs)]
+    _, stderr = run_once(args, importtime=True, env=env, expect=expect)
+    imports = parse_importtime(stderr)
+    return {
+        "target": name,
+        "median_ms": round(statistics.median(timings), 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "import_ms": round(sum(ms for _, ms in imports), 2),
+        "top_imports": [{"module": module, "ms": round(ms, 2)} for module, ms in imports[:top]]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs per target")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level imports to show")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS), help="only benchmark these targets")
+    parser.add_argument("--json", metavar="FILE", help="append results to a JSON lines file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        fast_env = None
+        for name in args.target or TARGETS:
+            command, expect = TARGETS[name]
+            env = None
+            if "--fast" in command:
+                fast_env = fast_env or prepare_fast_replay(directory)
+                env = fast_env
+            results.append(benchmark(name, command, args.runs, args.top, env=env, expect=expect))
+
+    for result in results:
+        name = result["target"]
+        print(f"{name}: median {result['median_ms']:.1f}ms "
+              f"(min {result['min_ms']:.1f}, max {result['max_ms']:.1f}), imports {result['import_ms']:.1f}ms")
+        for entry in result["top_imports"]:
+            print(f"  {entry['ms']:8.1f}ms  {entry['module']}")
+
+    if args.json:
+        record = {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "results": results
+        }
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nResults appended to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Helpers for starting the CLIs quickly in scripted use.
+
+Settings are read from the environment first; .env is only parsed when
+something is missing. The endpoint, model and last successful validation
+are cached in RUNPOD_CONFIG_CACHE (default ~/.cache/runpod-chat/config.json)
+so fast-start runs can skip the models round trip. A cached validation is
+trusted for RUNPOD_VALIDATION_TTL seconds (default one day), and only for
+the same token and endpoint. The token itself is never written to the
+cache, only a fingerprint of it.
+"""
+import os
+import json
+import time
+import hashlib
+
+
+def config_cache_path():
+    return os.getenv(
+        "RUNPOD_CONFIG_CACHE",
+        os.path.join(os.path.expanduser("~"), ".cache", "runpod-chat", "config.json")
+    )
+
+
+def fast_start_enabled(flag=False):
+    return flag or os.getenv("RUNPOD_FAST_START", "").lower() in ("1", "true", "yes")
+
+
+def load_environment(required):
+    """Load .env only when one of the required variables isn't already set"""
+    if all(os.getenv(name) for name in required):
+        return
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def token_fingerprint(token):
+    return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+
+def load_cached_config():
+    try:
+        with open(config_cache_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cached_config(token, endpoint_id, model_name, available_models):
+    """Remember a successful validation for this token and endpoint"""
+    path = config_cache_path()
+    config = {
+        "endpoint_id": endpoint_id,
+        "model_name": model_name,
+        "available_models": available_models,
+        "token_fingerprint": token_fingerprint(token),
+        "validated_at": int(time.time())
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+    except OSError:
+        pass
+
+
+def apply_cached_config(config):
+    """Fill in endpoint and model from the cache where the environment doesn't set them"""
+    if config.get("endpoint_id"):
+        os.environ.setdefault("RUNPOD_ENDPOINT_ID", config["endpoint_id"])
+    if config.get("model_name"):
+        os.environ.setdefault("MODEL_NAME", config["model_name"])
+
+
+def validation_ttl():
+    return int(os.getenv("RUNPOD_VALIDATION_TTL", str(24 * 60 * 60)))
+
+
+def validation_problem(config, token, endpoint_id):
+    """
+    Why the cached validation can't vouch for this token and endpoint,
+    or None when it can
+    """
+    if not config.get("validated_at"):
+        return "no cached validation"
+    if config.get("endpoint_id") != endpoint_id:
+        return "the cached validation is for a different endpoint"
+    if config.get("token_fingerprint") != token_fingerprint(token):
+        return "the cached validation is for a different token"
+    if time.time() - config["validated_at"] > validation_ttl():
+        return "the cached validation has expired"
+    return None
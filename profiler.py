@@ -0,0 +1,215 @@
+import time
+import threading
+
+# httpcore trace events (without the .started/.complete suffix) and the phase they count towards
+TRACE_PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.send_request_headers": "send",
+    "http11.send_request_body": "send",
+    "http11.receive_response_headers": "server_wait",
+    "http2.send_request_headers": "send",
+    "http2.send_request_body": "send",
+    "http2.receive_response_headers": "server_wait"
+}
+
+# Phases filled in by the trace, in the order they happen
+TRACED_PHASES = tuple(dict.fromkeys(TRACE_PHASES.values()))
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out while timing is switched off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class PhaseTimer:
+    """
+    Accumulates wall-clock time per named phase of a request.
+
+    A disabled timer hands out a shared no-op span, so leaving the
+    instrumentation in place costs next to nothing when it is off.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = {}
+
+    def span(self, name):
+        """Context manager timing the enclosed block as `name`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, ms):
+        """Add an externally measured duration in milliseconds to a phase"""
+        if not self.enabled:
+            return
+        total, calls = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + ms, calls + 1)
+
+    def total(self, name):
+        """Accumulated milliseconds for a phase"""
+        return self.phases.get(name, (0.0, 0))[0]
+
+    def breakdown(self):
+        """Phases in the order they were first recorded"""
+        return [
+            {"phase": name, "ms": round(total, 3), "calls": calls}
+            for name, (total, calls) in self.phases.items()
+        ]
+
+
+# Timer used when the caller doesn't pass one
+NULL_TIMER = PhaseTimer(enabled=False)
+
+
+def make_trace(timer):
+    """Build an httpcore trace callback that records connect, TLS and server wait phases"""
+    started = {}
+
+    def trace(event_name, info):
+        prefix, _, stage = event_name.rpartition(".")
+        phase = TRACE_PHASES.get(prefix)
+        if phase is None:
+            return
+        if stage == "started":
+            started[prefix] = time.perf_counter()
+        elif prefix in started:
+            timer.record(phase, (time.perf_counter() - started.pop(prefix)) * 1000)
+
+    return trace
+
+
+def trace_hooks(timer):
+    """httpx event hooks attaching a phase trace to every outgoing request"""
+    def add_trace(request):
+        request.extensions["trace"] = make_trace(timer)
+
+    return {"request": [add_trace]}
+
+
+# Only one script-run profile can be active per process: on Python 3.12+ cProfile
+# holds the process-wide sys.monitoring profiler slot
+_active_lock = threading.Lock()
+_active_profiler = None
+
+
+class ScriptProfiler:
+    """
+    Whole-run profile using cProfile, or pyinstrument when it is installed and requested
+    """
+
+    def __init__(self, backend="cProfile"):
+        self.backend = backend
+        self.running = False
+        if backend == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self.profiler = Profiler()
+            except ImportError:
+                self.backend = "cProfile"
+        if self.backend == "cProfile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        """
+        Start profiling. Returns False, leaving the profiler stopped, when another
+        session is already profiling this process.
+        """
+        global _active_profiler
+        with _active_lock:
+            if _active_profiler is not None:
+                owner = _active_profiler.thread
+                # A run interrupted before it could stop its profile (a rerun, or an
+                # exception) leaves it enabled; switch it off so it frees the slot
+                if owner is not threading.current_thread() and owner.is_alive():
+                    return False
+                _active_profiler.abandon()
+                _active_profiler = None
+            try:
+                if self.backend == "pyinstrument":
+                    self.profiler.start()
+                else:
+                    self.profiler.enable()
+            except (ValueError, RuntimeError):
+                return False
+            self.thread = threading.current_thread()
+            self.running = True
+            _active_profiler = self
+            return True
+
+    def abandon(self):
+        """Switch off a profile whose run ended without stopping it, discarding the capture"""
+        self.running = False
+        try:
+            if self.backend == "pyinstrument":
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+        except Exception:
+            # Nothing left to switch off
+            pass
+
+    def stop(self):
+        """
+        Stop profiling and return a capture dict with a download file name,
+        its data and mime type, and a short text summary
+        """
+        global _active_profiler
+        with _active_lock:
+            if _active_profiler is self:
+                _active_profiler = None
+        self.running = False
+        if self.backend == "pyinstrument":
+            self.profiler.stop()
+            return {
+                "file_name": "profile.html",
+                "data": self.profiler.output_html(),
+                "mime": "text/html",
+                "summary": self.profiler.output_text()
+            }
+
+        # Only needed once a capture is taken, so keep them off the import path
+        import io
+        import marshal
+        import pstats
+
+        self.profiler.disable()
+        self.profiler.create_stats()
+        # Same format as Profile.dump_stats, loadable with pstats or snakeviz
+        data = marshal.dumps(self.profiler.stats)
+        summary = io.StringIO()
+        pstats.Stats(self.profiler, stream=summary).sort_stats("cumulative").print_stats(25)
+        return {
+            "file_name": "profile.prof",
+            "data": data,
+            "mime": "application/octet-stream",
+            "summary": summary.getvalue()
+        }
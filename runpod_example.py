@@ -1,21 +1,31 @@
-import requests
+import sys
 import json
-import time
+import os
+import argparse
+from profiler import PhaseTimer, NULL_TIMER
+from fast_start import fast_start_enabled, load_environment
+import transport
 
 class RunPodAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, timer=NULL_TIMER, session=None):
         self.api_key = api_key
         self.base_url = "https://api.runpod.ai/v2"
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {api_key}'
         }
+        # Records request and JSON parsing time per method when enabled
+        self.timer = timer
+        # Live, recording or replaying session depending on RUNPOD_TRANSPORT
+        self.session = session or transport.requests_session()
 
     def get_pods(self):
         """Get list of all pods"""
         endpoint = f"{self.base_url}/get-pods"
-        response = requests.get(endpoint, headers=self.headers)
-        return response.json()
+        with self.timer.span("get_pods.request"):
+            response = self.session.get(endpoint, headers=self.headers)
+        with self.timer.span("get_pods.parse"):
+            return response.json()
 
     def create_pod(self, name, image_name, container_disk_in_gb=10, volume_in_gb=0, ports="80/http"):
         """Create a new pod"""
@@ -27,22 +37,28 @@ class RunPodAPI:
             "volume_in_gb": volume_in_gb,
             "ports": ports
         }
-        response = requests.post(endpoint, headers=self.headers, json=payload)
-        return response.json()
+        with self.timer.span("create_pod.request"):
+            response = self.session.post(endpoint, headers=self.headers, json=payload)
+        with self.timer.span("create_pod.parse"):
+            return response.json()
 
     def stop_pod(self, pod_id):
         """Stop a running pod"""
         endpoint = f"{self.base_url}/stop-pod"
         payload = {"pod_id": pod_id}
-        response = requests.post(endpoint, headers=self.headers, json=payload)
-        return response.json()
+        with self.timer.span("stop_pod.request"):
+            response = self.session.post(endpoint, headers=self.headers, json=payload)
+        with self.timer.span("stop_pod.parse"):
+            return response.json()
 
     def resume_pod(self, pod_id):
         """Resume a stopped pod"""
         endpoint = f"{self.base_url}/resume-pod"
         payload = {"pod_id": pod_id}
-        response = requests.post(endpoint, headers=self.headers, json=payload)
-        return response.json()
+        with self.timer.span("resume_pod.request"):
+            response = self.session.post(endpoint, headers=self.headers, json=payload)
+        with self.timer.span("resume_pod.parse"):
+            return response.json()
 
     def run_pod(self, pod_id, input_data):
         """Run a specific pod with input data"""
@@ -51,8 +67,10 @@ class RunPodAPI:
             'input': input_data
         }
         try:
-            response = requests.post(endpoint, headers=self.headers, json=data)
-            return response.json()
+            with self.timer.span("run_pod.request"):
+                response = self.session.post(endpoint, headers=self.headers, json=data)
+            with self.timer.span("run_pod.parse"):
+                return response.json()
         except json.JSONDecodeError:
             return {"error": "Invalid JSON response", "raw_response": response.text}
 
@@ -60,8 +78,10 @@ class RunPodAPI:
         """Check the status of a job"""
         endpoint = f"{self.base_url}/{job_id}/status"
         try:
-            response = requests.get(endpoint, headers=self.headers)
-            return response.json()
+            with self.timer.span("check_job_status.request"):
+                response = self.session.get(endpoint, headers=self.headers)
+            with self.timer.span("check_job_status.parse"):
+                return response.json()
         except json.JSONDecodeError:
             return {"error": "Invalid JSON response", "raw_response": response.text}
 
@@ -69,28 +89,58 @@ class RunPodAPI:
         """Get the output of a completed job"""
         endpoint = f"{self.base_url}/{job_id}/status"
         try:
-            response = requests.get(endpoint, headers=self.headers)
-            return response.json()
+            with self.timer.span("get_job_output.request"):
+                response = self.session.get(endpoint, headers=self.headers)
+            with self.timer.span("get_job_output.parse"):
+                return response.json()
         except json.JSONDecodeError:
             return {"error": "Invalid JSON response", "raw_response": response.text}
 
+def get_api_key(interactive=True):
+    """
+    API key from RUNPOD_API_KEY or RUNPOD_TOKEN (environment or .env),
+    asking for it only when running interactively
+    """
+    load_environment(["RUNPOD_API_KEY"])
+    api_key = os.getenv("RUNPOD_API_KEY") or os.getenv("RUNPOD_TOKEN")
+    if not api_key and interactive and sys.stdin.isatty():
+        # Get your API key from: https://www.runpod.io/console/user/settings
+        api_key = input("Please enter your RunPod API key: ")
+    return api_key
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a job on a RunPod endpoint and wait for its output")
+    parser.add_argument("--pod-id", default="tzwg1ryfn03n0t", help="endpoint to run the job on")
+    parser.add_argument("--prompt", default="What is the capital of France?", help="prompt to send")
+    parser.add_argument("--max-tokens", type=int, default=50, help="maximum tokens to generate")
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="non-interactive fast start: never prompt for the API key (also enabled by RUNPOD_FAST_START=1)"
+    )
+    return parser.parse_args()
+
 def main():
-    # Get your API key from: https://www.runpod.io/console/user/settings
-    # Replace this with your actual RunPod API key
-    API_KEY = input("Please enter your RunPod API key: ")
+    args = parse_args()
+    API_KEY = get_api_key(interactive=not fast_start_enabled(args.fast))
+    if not API_KEY:
+        print("No API key found. Set RUNPOD_API_KEY in the environment or your .env file.")
+        sys.exit(1)
     
     # Initialize the RunPod API client with your API key
-    runpod = RunPodAPI(API_KEY)
+    # Set RUNPOD_PROFILE=1 to print a per-phase timing breakdown at the end
+    timer = PhaseTimer(enabled=bool(os.getenv("RUNPOD_PROFILE")))
+    runpod = RunPodAPI(API_KEY, timer=timer)
     
     try:
         # Example: Run a specific pod with input data
         print("\nRunning pod with input data...")
-        pod_id = "tzwg1ryfn03n0t"  # The pod ID you were invited to use
+        pod_id = args.pod_id  # The pod ID you were invited to use
         input_data = {
             "input": {
                 # Add your input parameters here
-                "prompt": "What is the capital of France?",
-                "max_tokens": 50
+                "prompt": args.prompt,
+                "max_tokens": args.max_tokens
             }
         }
         result = runpod.run_pod(pod_id, input_data)
@@ -114,10 +164,15 @@ def main():
                     break
                 
                 # Wait for 2 seconds before checking again
-                time.sleep(2)
+                transport.sleep(2)
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+    
+    if timer.enabled:
+        print("\nPhase breakdown (ms):")
+        for phase in timer.breakdown():
+            print(f"- {phase['phase']}: {phase['ms']:.1f} ({phase['calls']} calls)")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,355 @@
+import os
+import re
+import time
+import zlib
+import atexit
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger("runpod_chat.semantic_cache")
+
+# Minimum cosine similarity for a hit unless SEMANTIC_CACHE_THRESHOLD says otherwise
+DEFAULT_THRESHOLD = 0.9
+
+# Bump when the features change, so indexes built with the old ones are discarded
+EMBEDDING_VERSION = 3
+
+# Words that point at the role of the next content word ("convert string to INT",
+# "faster than JAVA", "capital of ITALY"); they carry order into the embedding
+RELATIONS = {
+    "of", "to", "than", "from", "into", "for", "in", "on", "by", "with", "vs",
+    "versus", "over", "before", "after", "without", "between"
+}
+
+# Words that carry no meaning for matching questions against each other
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "is", "are", "be",
+    "what", "whats", "which", "who", "how", "s", "do", "does", "can", "could",
+    "would", "please", "tell", "me", "i", "you", "it", "and", "or", "about",
+    "by", "with"
+}
+
+# "Who WAS the president" has a different answer from "who is the president"
+PAST_TENSE = {"was", "were", "did"}
+
+# Words (with "c++"/"c#" kept whole) and single operator or symbol characters,
+# so "10 - 3" and "10 + 3" don't embed to the same vector
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\+\+|#)?|[-+*/=<>#]")
+CONTRACTION_PATTERN = re.compile(r"\b(what|that|it|who|where|how|there|here|he|she|let)['’]s\b")
+# "italy's capital" -> "capital of italy", so both phrasings produce the same relations
+POSSESSIVE_PATTERN = re.compile(r"\b([a-z0-9]+)['’]s\s+([a-z0-9]+)")
+LEFTOVER_POSSESSIVE_PATTERN = re.compile(r"['’]s\b")
+# "e-mail" is a word; only hyphens between numbers or spaces are treated as minus
+WORD_HYPHEN_PATTERN = re.compile(r"(?<=[a-z])-(?=[a-z])")
+
+# Question pairs the embedding must keep matching (paraphrases) or keep apart
+# (different answers) at the default threshold; run this module to check them
+SAME_ANSWER_EXAMPLES = [
+    ("What is the capital of Italy?", "what's Italy's capital"),
+    ("How to reverse a list in python", "How do I reverse a list in Python?")
+]
+DIFFERENT_ANSWER_EXAMPLES = [
+    ("How do I convert a string to int?", "How do I convert an int to string?"),
+    ("What is 10 - 3?", "What is 10 + 3?"),
+    ("What is 2*3", "What is 2+3"),
+    ("Is C++ better than C?", "Is C better than C++?"),
+    ("Who is the president of the USA?", "Who was the president of the USA?")
+]
+
+
+def _stable_hash(text):
+    """Process-independent hash so persisted vectors stay valid across restarts"""
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def _pack_strings(strings):
+    """Encode strings as one UTF-8 byte array plus offsets, without per-entry padding"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data, offsets):
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def _add_feature(vector, feature, weight):
+    h = _stable_hash(feature)
+    sign = 1.0 if (h >> 31) & 1 else -1.0
+    vector[h % len(vector)] += sign * weight
+
+
+def embed_text(text, dim=512):
+    """
+    Compute a local, offline embedding for a piece of text.
+
+    Uses signed feature hashing over content words and their character
+    trigrams, so rephrasings with the same key words land close together
+    and small typos still overlap. Ordered word pairs and "relation word +
+    content word" features keep swapped questions ("string to int" vs
+    "int to string") apart, operators count as words, and past-tense
+    questions get a feature of their own. Returns an L2-normalised float32
+    vector.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    normalized = CONTRACTION_PATTERN.sub(r"\1 is", text.lower())
+    normalized = POSSESSIVE_PATTERN.sub(r"\2 of \1", normalized)
+    normalized = LEFTOVER_POSSESSIVE_PATTERN.sub("", normalized)
+    normalized = WORD_HYPHEN_PATTERN.sub("", normalized)
+
+    previous_word = None
+    relation = None
+    for token in TOKEN_PATTERN.findall(normalized):
+        if token in PAST_TENSE:
+            _add_feature(vector, "t:past", 3.0)
+            continue
+        if token in RELATIONS:
+            relation = token
+            continue
+        if token in STOPWORDS:
+            continue
+
+        features = [(f"w:{token}", 1.0)]
+        padded = f"<{token}>"
+        features += [(f"c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+        # A relation only means something between two content words ("how TO reverse" has no head)
+        if relation is not None and previous_word is not None:
+            features.append((f"r:{relation}:{token}", 2.0))
+        if previous_word is not None:
+            features.append((f"b:{previous_word}:{token}", 1.0))
+        previous_word = token
+        relation = None
+
+        for feature, weight in features:
+            _add_feature(vector, feature, weight)
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class SemanticCache:
+    """
+    Persistent, capacity-bounded cache of past answers searched by cosine similarity.
+
+    Entries live in a NumPy matrix of normalised embeddings; the least recently
+    used entry is evicted once the capacity is reached. Changes are written to
+    disk by a background timer `save_delay` seconds after the first unsaved
+    add, and once more at exit. A saved index is only reused by a cache for
+    the same `model`, so answers written by another model are never served.
+    """
+
+    def __init__(self, path=".semantic_cache.npz", capacity=1000, threshold=DEFAULT_THRESHOLD, dim=512, save_delay=2.0, model=""):
+        if capacity < 1:
+            raise ValueError(f"Semantic cache capacity must be at least 1, not {capacity}")
+        self.path = path
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self.model = model or ""
+        self.save_delay = save_delay
+        self.lock = threading.Lock()
+        # Serialises writers so a slow save can't overlap the next one
+        self.write_lock = threading.Lock()
+        self.save_timer = None
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.questions = [""] * capacity
+        self.answers = [""] * capacity
+        self.size = 0
+        self.tick = 0
+
+        # Lookup statistics
+        self.lookups = 0
+        self.hits = 0
+        self.total_lookup_ms = 0.0
+        self.last_lookup_ms = 0.0
+
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        """Load a previously saved index, ignoring files that don't match the current layout"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                vectors = data["vectors"]
+                if vectors.shape[1] != self.dim or "version" not in data or int(data["version"]) != EMBEDDING_VERSION:
+                    return
+                if "model" not in data or str(data["model"]) != self.model:
+                    logger.info("Discarding semantic cache in %s built for another model", self.path)
+                    return
+                # Keep the most recently used entries if the capacity shrank
+                order = np.argsort(data["last_used"])[::-1][:self.capacity]
+                count = len(order)
+                self.vectors[:count] = vectors[order]
+                self.last_used[:count] = data["last_used"][order]
+                questions = _unpack_strings(data["questions"], data["question_offsets"])
+                answers = _unpack_strings(data["answers"], data["answer_offsets"])
+                for slot, index in enumerate(order):
+                    self.questions[slot] = questions[index]
+                    self.answers[slot] = answers[index]
+                self.size = count
+                self.tick = int(data["tick"])
+        except Exception as e:
+            logger.warning("Could not load semantic cache from %s: %s", self.path, e)
+
+    def _snapshot(self):
+        """Copy the live entries; the caller holds the lock"""
+        return {
+            "vectors": self.vectors[:self.size].copy(),
+            "last_used": self.last_used[:self.size].copy(),
+            "questions": self.questions[:self.size],
+            "answers": self.answers[:self.size],
+            "tick": self.tick
+        }
+
+    def _write(self, snapshot):
+        """Write a snapshot to disk atomically, outside the lookup lock"""
+        questions, question_offsets = _pack_strings(snapshot["questions"])
+        answers, answer_offsets = _pack_strings(snapshot["answers"])
+        tmp_path = f"{self.path}.tmp.npz"
+        with self.write_lock:
+            np.savez(
+                tmp_path,
+                vectors=snapshot["vectors"],
+                last_used=snapshot["last_used"],
+                questions=questions,
+                question_offsets=question_offsets,
+                answers=answers,
+                answer_offsets=answer_offsets,
+                tick=np.array(snapshot["tick"]),
+                version=np.array(EMBEDDING_VERSION),
+                model=np.array(self.model)
+            )
+            os.replace(tmp_path, self.path)
+
+    def _schedule_save(self):
+        """Start the debounce timer unless one is already pending; the caller holds the lock"""
+        if not self.path or self.save_timer is not None:
+            return
+        self.save_timer = threading.Timer(self.save_delay, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+
+    def flush(self):
+        """Write pending changes now"""
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            snapshot = self._snapshot()
+        try:
+            self._write(snapshot)
+        except Exception as e:
+            logger.warning("Could not save semantic cache to %s: %s", self.path, e)
+
+    def lookup(self, question):
+        """Return the stored answer for the closest past question, or None below the threshold"""
+        start_time = time.perf_counter()
+        with self.lock:
+            answer = None
+            if self.size:
+                query = embed_text(question, self.dim)
+                similarities = self.vectors[:self.size] @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.tick += 1
+                    self.last_used[best] = self.tick
+                    answer = self.answers[best]
+
+            # Update lookup statistics
+            self.last_lookup_ms = (time.perf_counter() - start_time) * 1000
+            self.total_lookup_ms += self.last_lookup_ms
+            self.lookups += 1
+            if answer is not None:
+                self.hits += 1
+            return answer
+
+    def add(self, question, answer):
+        """Store an answer, replacing a near-identical entry or evicting the least recently used one"""
+        vector = embed_text(question, self.dim)
+        with self.lock:
+            self.tick += 1
+            slot = None
+            if self.size:
+                similarities = self.vectors[:self.size] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= 0.999:
+                    slot = best
+            if slot is None:
+                if self.size < self.capacity:
+                    slot = self.size
+                    self.size += 1
+                else:
+                    slot = int(np.argmin(self.last_used[:self.size]))
+
+            self.vectors[slot] = vector
+            self.last_used[slot] = self.tick
+            self.questions[slot] = question
+            self.answers[slot] = answer
+            self._schedule_save()
+
+    def stats(self):
+        """Hit rate and lookup latency for the stats panel"""
+        with self.lock:
+            return {
+                "entries": self.size,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "last_lookup_ms": round(self.last_lookup_ms, 3),
+                "avg_lookup_ms": round(self.total_lookup_ms / self.lookups, 3) if self.lookups else 0.0
+            }
+
+
+def standalone_question(messages):
+    """
+    Return the user's question when it opens the conversation, otherwise None.
+
+    Answers to follow-ups ("Why?", "And France?") depend on the earlier turns,
+    so only questions without a prior assistant turn are safe to cache.
+    """
+    if any(message["role"] == "assistant" for message in messages):
+        return None
+    for message in reversed(messages):
+        if message["role"] == "user":
+            return message["content"]
+    return None
+
+
+def cache_from_env(model_name=None):
+    """
+    Build a SemanticCache configured from environment variables, or None when disabled.
+    Answers are kept per model; `model_name` defaults to MODEL_NAME.
+    """
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    capacity = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "1000"))
+    if capacity < 1:
+        logger.warning("SEMANTIC_CACHE_CAPACITY is %s; the semantic cache is disabled", capacity)
+        return None
+    return SemanticCache(
+        path=os.getenv("SEMANTIC_CACHE_PATH", ".semantic_cache.npz"),
+        capacity=capacity,
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD)),
+        model=model_name if model_name is not None else os.getenv("MODEL_NAME", "")
+    )
+
+
+if __name__ == "__main__":
+    failures = 0
+    for expect_hit, examples in ((True, SAME_ANSWER_EXAMPLES), (False, DIFFERENT_ANSWER_EXAMPLES)):
+        for first, second in examples:
+            score = float(embed_text(first) @ embed_text(second))
+            ok = (score >= DEFAULT_THRESHOLD) == expect_hit
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {score:.3f}  {first!r} vs {second!r}")
+    raise SystemExit(1 if failures else 0)
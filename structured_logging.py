@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import random
+import logging
+import threading
+
+LOGGER_NAME = "runpod_chat"
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line, merging in its structured fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def payload_sample_rate():
+    """Fraction of requests whose full prompt and response are logged (LOG_PAYLOAD_SAMPLE_RATE)"""
+    try:
+        return min(max(float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0")), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+def get_logger():
+    """
+    Logger for the app, configured once per process.
+
+    Records are handed to a queue on the calling thread; formatting and
+    writing to LOG_FILE (stderr by default) happen on a background thread.
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is None:
+            # Imported here to keep them off the CLIs' start-up path
+            import queue
+            import atexit
+            from logging.handlers import QueueHandler, QueueListener
+
+            log_file = os.getenv("LOG_FILE")
+            if log_file:
+                handler = logging.FileHandler(log_file, encoding="utf-8")
+            else:
+                handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonFormatter())
+
+            log_queue = queue.SimpleQueue()
+            logger.addHandler(QueueHandler(log_queue))
+            logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+            logger.propagate = False
+
+            _listener = QueueListener(log_queue, handler)
+            _listener.start()
+            # Flush whatever is still queued when the process exits
+            atexit.register(_listener.stop)
+    return logger
+
+
+def new_request_id():
+    return os.urandom(6).hex()
+
+
+def should_capture_payload():
+    """Decide once per request whether its full payload is logged"""
+    rate = payload_sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """
+    Log a structured event, skipping the queue entirely when the level is disabled.
+    Fields set to None are left out, so unsampled payloads don't show up as nulls.
+    """
+    if logger.isEnabledFor(level):
+        fields = {key: value for key, value in fields.items() if value is not None}
+        logger.log(level, event, extra={"fields": fields})
@@ -0,0 +1,88 @@
+"""
+Pluggable HTTP transport that can record live sessions to cassette files and
+replay them offline.
+
+The mode is picked with RUNPOD_TRANSPORT:
+
+- live (default): talk to the RunPod API as usual
+- record: talk to the API and save every request/response pair, including
+  streamed chunks and their inter-arrival timings, to RUNPOD_CASSETTE
+  (appended to the interactions already in it)
+- replay: serve responses from RUNPOD_CASSETTE without touching the network,
+  at the recorded speed scaled by RUNPOD_REPLAY_SPEED (0 = no delays)
+"""
+import os
+import time
+
+from transport.cassette import Cassette, CassetteMiss
+
+_cassettes = {}
+
+
+def transport_mode():
+    mode = os.getenv("RUNPOD_TRANSPORT", "live").lower()
+    if mode not in ("live", "record", "replay"):
+        raise ValueError(f"RUNPOD_TRANSPORT should be live, record or replay, not {mode!r}")
+    return mode
+
+
+def replay_speed():
+    return float(os.getenv("RUNPOD_REPLAY_SPEED", "1"))
+
+
+def get_cassette():
+    """
+    Process-wide cassette for RUNPOD_CASSETTE, so reruns keep their replay position.
+    Recording into an existing cassette adds to it rather than replacing it.
+    """
+    path = os.getenv("RUNPOD_CASSETTE", "cassettes/session.json")
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path, load=transport_mode() == "replay" or os.path.exists(path))
+    return _cassettes[path]
+
+
+def sleep(seconds):
+    """time.sleep for polling loops, scaled down along with the replayed traffic"""
+    if transport_mode() == "replay":
+        speed = replay_speed()
+        seconds = seconds / speed if speed > 0 else 0
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def requests_session():
+    """requests.Session whose adapters follow the configured transport mode"""
+    import requests
+    session = requests.Session()
+    mode = transport_mode()
+    if mode == "live":
+        return session
+
+    from transport.requests_adapter import RecordingAdapter, ReplayAdapter
+    if mode == "record":
+        adapter = RecordingAdapter(get_cassette())
+    else:
+        adapter = ReplayAdapter(get_cassette(), replay_speed())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def httpx_client(event_hooks=None):
+    """
+    httpx.Client for the OpenAI client's http_client argument.
+    Returns None in live mode without hooks, so the OpenAI default is used.
+    """
+    mode = transport_mode()
+    if mode == "live" and not event_hooks:
+        return None
+
+    import httpx
+    transport = None
+    if mode != "live":
+        from transport.httpx_transport import RecordingTransport, ReplayTransport
+        if mode == "record":
+            transport = RecordingTransport(get_cassette())
+        else:
+            transport = ReplayTransport(get_cassette(), replay_speed())
+    return httpx.Client(transport=transport, event_hooks=event_hooks)
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import atexit
+import base64
+import hashlib
+import threading
+
+# Response headers that are tied to the original connection or account
+SKIPPED_HEADERS = {"set-cookie", "transfer-encoding", "connection"}
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded"""
+
+
+def request_key(method, url, body):
+    """Match requests on method, URL and a digest of the body, ignoring JSON key order"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    body = body or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    return f"{method.upper()} {url} {hashlib.sha1(body).hexdigest()[:16]}"
+
+
+def encode_chunk(delay, data):
+    try:
+        return {"delay": round(delay, 6), "text": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"delay": round(delay, 6), "b64": base64.b64encode(data).decode("ascii")}
+
+
+def decode_chunk(chunk):
+    if "b64" in chunk:
+        return base64.b64decode(chunk["b64"])
+    return chunk["text"].encode("utf-8")
+
+
+def wait(delay, speed):
+    """Sleep for a recorded delay scaled by the replay speed (0 = don't wait)"""
+    if speed > 0 and delay > 0:
+        time.sleep(delay / speed)
+
+
+class Cassette:
+    """
+    Recorded HTTP interactions stored as a JSON file.
+
+    In replay, interactions with the same key are served in recorded order;
+    once they run out the last one is repeated, which keeps status polling
+    loops working when they poll more often than during the recording.
+
+    Recorded interactions are written by a background timer `save_delay`
+    seconds after the first unsaved one, and once more at exit, so recording
+    doesn't rewrite the file on the request path.
+    """
+
+    def __init__(self, path, load=True, save_delay=2.0):
+        self.path = path
+        self.save_delay = save_delay
+        self.lock = threading.Lock()
+        # Serialises writers so a slow save can't overlap the next one
+        self.write_lock = threading.Lock()
+        self.save_timer = None
+        self.interactions = []
+        self.positions = {}
+        if load:
+            with open(path, encoding="utf-8") as f:
+                self.interactions = json.load(f)["interactions"]
+        atexit.register(self.flush)
+
+    def record(self, method, url, body, status, headers, elapsed, chunks):
+        """Save one interaction; chunks is a list of (delay, bytes) pairs"""
+        interaction = {
+            "request": {
+                "method": method.upper(),
+                "url": url,
+                "key": request_key(method, url, body)
+            },
+            "response": {
+                "status": status,
+                "headers": {k: v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS},
+                "elapsed": round(elapsed, 6),
+                "chunks": [encode_chunk(delay, data) for delay, data in chunks]
+            }
+        }
+        with self.lock:
+            self.interactions.append(interaction)
+            if self.save_timer is None:
+                self.save_timer = threading.Timer(self.save_delay, self.flush)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def flush(self):
+        """Write interactions recorded since the last save"""
+        with self.lock:
+            if self.save_timer is None:
+                return
+            self.save_timer.cancel()
+            self.save_timer = None
+            interactions = list(self.interactions)
+        self._write(interactions)
+
+    def _write(self, interactions):
+        """Write the cassette atomically, outside the lock the request path takes"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self.write_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "interactions": interactions}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def play(self, method, url, body):
+        """Return the recorded response for a request"""
+        key = request_key(method, url, body)
+        with self.lock:
+            matches = [i for i in self.interactions if i["request"]["key"] == key]
+            if not matches:
+                raise CassetteMiss(f"No recorded response for {method.upper()} {url} in {self.path}")
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            return matches[min(position, len(matches) - 1)]["response"]
@@ -0,0 +1,89 @@
+import time
+
+import httpx
+
+from transport.cassette import decode_chunk, wait
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Pass chunks through while noting when each one arrived"""
+
+    def __init__(self, stream, on_close):
+        self.stream = stream
+        self.on_close = on_close
+        self.chunks = []
+        self.last = time.perf_counter()
+
+    def __iter__(self):
+        for data in self.stream:
+            now = time.perf_counter()
+            self.chunks.append((now - self.last, data))
+            self.last = now
+            yield data
+
+    def close(self):
+        self.stream.close()
+        if self.on_close is not None:
+            self.on_close(self.chunks)
+            self.on_close = None
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks, speed):
+        self.chunks = chunks
+        self.speed = speed
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            wait(chunk["delay"], self.speed)
+            yield decode_chunk(chunk)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Wraps the real transport and saves each exchange to a cassette once its body is closed"""
+
+    def __init__(self, cassette, wrapped=None):
+        self.cassette = cassette
+        self.wrapped = wrapped or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        # Plain bodies keep the cassette readable and the chunks replayable
+        request.headers["Accept-Encoding"] = "identity"
+        body = request.read()
+        start = time.perf_counter()
+        response = self.wrapped.handle_request(request)
+        elapsed = time.perf_counter() - start
+
+        def save(chunks):
+            self.cassette.record(
+                request.method, str(request.url), body,
+                response.status_code, response.headers, elapsed, chunks
+            )
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, save),
+            extensions=response.extensions
+        )
+
+    def close(self):
+        self.wrapped.close()
+        self.cassette.flush()
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Serves responses from a cassette, streaming chunks at the recorded pace"""
+
+    def __init__(self, cassette, speed=1.0):
+        self.cassette = cassette
+        self.speed = speed
+
+    def handle_request(self, request):
+        recorded = self.cassette.play(request.method, str(request.url), request.read())
+        wait(recorded["elapsed"], self.speed)
+        return httpx.Response(
+            status_code=recorded["status"],
+            headers=recorded["headers"],
+            stream=_ReplayStream(recorded["chunks"], self.speed)
+        )
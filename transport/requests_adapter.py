@@ -0,0 +1,76 @@
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from transport.cassette import decode_chunk, wait
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that saves every exchange, with chunk timings, to a cassette"""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        # Plain bodies keep the cassette readable and the chunks replayable
+        request.headers["Accept-Encoding"] = "identity"
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        chunks = []
+        last = time.perf_counter()
+        for data in response.iter_content(chunk_size=None):
+            now = time.perf_counter()
+            chunks.append((now - last, data))
+            last = now
+        response._content = b"".join(data for _, data in chunks)
+        response._content_consumed = True
+
+        # iter_content already decoded the body, so don't replay it as compressed
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-encoding"}
+        self.cassette.record(
+            request.method, request.url, request.body,
+            response.status_code, headers, elapsed, chunks
+        )
+        return response
+
+    def close(self):
+        super().close()
+        self.cassette.flush()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Adapter that answers from a cassette without opening any connection"""
+
+    def __init__(self, cassette, speed=1.0):
+        super().__init__()
+        self.cassette = cassette
+        self.speed = speed
+
+    def send(self, request, **kwargs):
+        recorded = self.cassette.play(request.method, request.url, request.body)
+        wait(recorded["elapsed"], self.speed)
+
+        content = b""
+        for chunk in recorded["chunks"]:
+            wait(chunk["delay"], self.speed)
+            content += decode_chunk(chunk)
+
+        response = Response()
+        response.status_code = recorded["status"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = content
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        pass
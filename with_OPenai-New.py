@@ -1,8 +1,19 @@
-from openai import OpenAI
 import os
 import json
-from dotenv import load_dotenv
-load_dotenv()
+import time
+import argparse
+import logging
+from structured_logging import LOGGER_NAME, get_logger, log_event, new_request_id, should_capture_payload
+from transport import httpx_client
+from fast_start import (
+    fast_start_enabled, load_environment, load_cached_config, save_cached_config,
+    apply_cached_config, validation_problem
+)
+
+# Handlers are attached in main(), once .env has had a chance to set LOG_* options
+logger = logging.getLogger(LOGGER_NAME)
+
+SYSTEM_PROMPT = "You are a helpful and knowledgeable AI assistant. Answer questions accurately and concisely."
 
 def validate_environment():
     """Validate environment variables are set correctly"""
@@ -44,14 +55,38 @@ def format_prompt(messages):
     formatted_text += "Assistant: "
     return formatted_text
 
+def create_client(endpoint_id, token):
+    """
+    Create the OpenAI client for a RunPod endpoint. openai is imported here
+    so that --help and argument errors don't pay for it.
+    """
+    from openai import OpenAI
+    return OpenAI(
+        api_key=token,
+        base_url=f"https://api.runpod.ai/v2/{endpoint_id}/openai/v1",
+        http_client=httpx_client()
+    )
+
 def get_chatbot_response(client, model_name, messages, temperature=0.7):
     """
     Get response from the RunPod endpoint using OpenAI compatibility layer
     """
+    request_id = new_request_id()
+    capture_payload = should_capture_payload()
     try:
+        start_time = time.time()
+        
         # Format the prompt
         formatted_prompt = format_prompt(messages)
-        print("\nDebug - Formatted prompt:", formatted_prompt)
+        log_event(
+            logger,
+            "completion_request",
+            request_id=request_id,
+            model=model_name,
+            messages=len(messages),
+            prompt_chars=len(formatted_prompt),
+            prompt=formatted_prompt if capture_payload else None
+        )
         
         # Create a completion with specific parameters for Llama
         response = client.completions.create(
@@ -66,7 +101,16 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
             stream=False
         )
         
-        print("\nDebug - Full response:", response)
+        usage = getattr(response, 'usage', None)
+        log_event(
+            logger,
+            "completion_done",
+            request_id=request_id,
+            execution_ms=int((time.time() - start_time) * 1000),
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            completion_tokens=getattr(usage, 'completion_tokens', None),
+            response=response.model_dump() if capture_payload and hasattr(response, 'model_dump') else None
+        )
         
         # Extract the response text
         if hasattr(response, 'choices') and response.choices:
@@ -86,12 +130,12 @@ def get_chatbot_response(client, model_name, messages, temperature=0.7):
                     return str(output[0]).strip()
                 return str(output).strip()
         
-        print("\nDebug - Could not extract response content. Response structure:", response)
+        log_event(logger, "empty_response", level=logging.WARNING, request_id=request_id, response=str(response))
         return "No response generated"
             
     except Exception as e:
         error_msg = str(e)
-        print(f"\nDebug - Error in get_chatbot_response: {error_msg}")
+        log_event(logger, "completion_error", level=logging.ERROR, request_id=request_id, error=error_msg)
         if "401" in error_msg:
             return "Authentication failed. Please check your RunPod API token."
         elif "404" in error_msg:
@@ -116,7 +160,213 @@ def get_available_models(client):
             print(f"Error getting models: {error_msg}")
         return []
 
+def load_prompts(path):
+    """
+    Read prompts from a file: one prompt per line, or JSON lines with a "prompt" field.
+    Lines that aren't JSON objects with a "prompt" field are taken as plain text.
+    """
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            prompt = line
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict) and "prompt" in record:
+                    prompt = str(record["prompt"])
+            prompts.append(prompt)
+    return prompts
+
+def make_batches(prompts, max_batch_size=16, max_batch_tokens=8000):
+    """
+    Group (index, prompt) pairs into batches bounded by prompt count and estimated prompt tokens
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for index, prompt in enumerate(prompts):
+        tokens = len(prompt.split())
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, prompt))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def complete_batch(client, model_name, batch, temperature=0.7, max_tokens=2000):
+    """
+    Send one batch of prompts in a single completions request.
+    Returns the texts ordered like the batch, the completion token count and the elapsed seconds.
+    Prompts the backend returned no choice for get None instead of a text.
+    """
+    request_id = new_request_id()
+    capture_payload = should_capture_payload()
+    log_event(
+        logger,
+        "completion_request",
+        request_id=request_id,
+        model=model_name,
+        batch_size=len(batch),
+        prompt_indices=[index for index, _ in batch],
+        prompt_chars=sum(len(prompt) for _, prompt in batch),
+        prompts=[prompt for _, prompt in batch] if capture_payload else None
+    )
+    
+    start_time = time.time()
+    try:
+        response = client.completions.create(
+            model=model_name,
+            prompt=[prompt for _, prompt in batch],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            top_p=0.9,
+            frequency_penalty=0.0,
+            presence_penalty=0.0,
+            stop=["Human:", "\n\n"],
+            stream=False
+        )
+    except Exception as e:
+        log_event(logger, "completion_error", level=logging.ERROR, request_id=request_id,
+                  batch_size=len(batch), error=str(e))
+        raise
+    elapsed = time.time() - start_time
+    
+    # Choices may come back in any order, so map them back by index
+    texts = [None] * len(batch)
+    for choice in response.choices:
+        if 0 <= choice.index < len(batch):
+            texts[choice.index] = (choice.text or "").strip()
+    missing = [index for (index, _), text in zip(batch, texts) if text is None]
+    
+    if getattr(response, 'usage', None) and response.usage.completion_tokens:
+        completion_tokens = response.usage.completion_tokens
+    else:
+        completion_tokens = sum(len(text.split()) for text in texts if text is not None)
+    
+    log_event(
+        logger,
+        "completion_done",
+        request_id=request_id,
+        batch_size=len(batch),
+        prompt_indices=[index for index, _ in batch],
+        execution_ms=int(elapsed * 1000),
+        prompt_tokens=getattr(getattr(response, 'usage', None), 'prompt_tokens', None),
+        completion_tokens=completion_tokens,
+        response_chars=sum(len(text) for text in texts if text is not None),
+        missing_indices=missing or None,
+        responses=texts if capture_payload else None
+    )
+    if missing:
+        log_event(logger, "completion_missing_choices", level=logging.WARNING, request_id=request_id,
+                  batch_size=len(batch), missing_indices=missing)
+    
+    return texts, completion_tokens, elapsed
+
+def run_batch(client, model_name, prompts, output_path, max_batch_size=16, max_batch_tokens=8000,
+              concurrency=4, max_tokens=2000, raw=False):
+    """
+    Complete many prompts with several batch requests in flight, writing results as they arrive
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    if raw:
+        formatted = prompts
+    else:
+        formatted = [
+            format_prompt([
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ])
+            for prompt in prompts
+        ]
+    batches = make_batches(formatted, max_batch_size, max_batch_tokens)
+    print(f"Sending {len(prompts)} prompts in {len(batches)} batches ({concurrency} in flight)")
+    
+    start_time = time.time()
+    total_tokens = 0
+    failed = 0
+    with open(output_path, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(complete_batch, client, model_name, batch, max_tokens=max_tokens): number
+            for number, batch in enumerate(batches, start=1)
+        }
+        for future in as_completed(futures):
+            number = futures[future]
+            batch = batches[number - 1]
+            try:
+                texts, completion_tokens, elapsed = future.result()
+            except Exception as e:
+                failed += len(batch)
+                print(f"Batch {number}/{len(batches)}: failed - {str(e)}")
+                for index, _ in batch:
+                    out.write(json.dumps({"index": index, "prompt": prompts[index], "error": str(e)}) + "\n")
+                out.flush()
+                continue
+            
+            missing = 0
+            for (index, _), text in zip(batch, texts):
+                if text is None:
+                    missing += 1
+                    out.write(json.dumps({"index": index, "prompt": prompts[index], "error": "no choice returned"}) + "\n")
+                else:
+                    out.write(json.dumps({"index": index, "prompt": prompts[index], "response": text}) + "\n")
+            out.flush()
+            failed += missing
+            
+            total_tokens += completion_tokens
+            tokens_per_sec = completion_tokens / elapsed if elapsed > 0 else 0.0
+            print(f"Batch {number}/{len(batches)}: {len(batch)} prompts, {completion_tokens} tokens "
+                  f"in {elapsed:.2f}s ({tokens_per_sec:.1f} tokens/sec)"
+                  + (f", {missing} without a response" if missing else ""))
+    
+    total_time = time.time() - start_time
+    overall = total_tokens / total_time if total_time > 0 else 0.0
+    print(f"\nDone: {len(prompts) - failed}/{len(prompts)} prompts, {total_tokens} tokens "
+          f"in {total_time:.2f}s ({overall:.1f} tokens/sec)")
+    print(f"Results written to {output_path}")
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query a RunPod endpoint through its OpenAI compatibility layer")
+    parser.add_argument("--batch", metavar="FILE", help="complete every prompt in FILE instead of the test question")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSON lines file for batch results")
+    parser.add_argument("--batch-size", type=positive_int, default=16, help="maximum prompts per request")
+    parser.add_argument("--max-batch-tokens", type=positive_int, default=8000, help="maximum estimated prompt tokens per request")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="batch requests kept in flight")
+    parser.add_argument("--max-tokens", type=positive_int, default=2000, help="maximum completion tokens per prompt")
+    parser.add_argument("--raw", action="store_true", help="send prompts as-is instead of wrapping them in the chat format")
+    parser.add_argument("--prompt", default="What is the capital of Italy?", help="question to ask outside batch mode")
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="non-interactive fast start: take endpoint and model from the environment or the cached config "
+             "and skip the models round trip (also enabled by RUNPOD_FAST_START=1)"
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    fast = fast_start_enabled(args.fast)
+    
+    # Read .env only when the environment doesn't already have everything
+    load_environment(["RUNPOD_TOKEN", "RUNPOD_ENDPOINT_ID", "MODEL_NAME"])
+    get_logger()
+    cached_config = load_cached_config() if fast else {}
+    apply_cached_config(cached_config)
+    
     # Validate environment variables
     errors = validate_environment()
     if errors:
@@ -127,36 +377,58 @@ def main():
         return
 
     # Initialize the OpenAI Client with RunPod configuration
+    token = os.getenv("RUNPOD_TOKEN")
     endpoint_id = os.getenv("RUNPOD_ENDPOINT_ID")
-    base_url = f"https://api.runpod.ai/v2/{endpoint_id}/openai/v1"
-    print(f"Connecting to endpoint: {base_url}")
+    model_name = os.getenv("MODEL_NAME")
+    print(f"Connecting to endpoint: https://api.runpod.ai/v2/{endpoint_id}/openai/v1")
 
-    client = OpenAI(
-        api_key=os.getenv("RUNPOD_TOKEN"),
-        base_url=base_url
-    )
+    client = create_client(endpoint_id, token)
 
-    # Get available models
-    print("\nFetching available models...")
-    available_models = get_available_models(client)
-    if available_models:
-        print("Available models:", available_models)
-    else:
-        print("No models available or couldn't fetch models.")
+    # Batch mode: the model comes from the environment, so skip the models round trip
+    if args.batch:
+        run_batch(
+            client,
+            model_name,
+            load_prompts(args.batch),
+            args.output,
+            max_batch_size=args.batch_size,
+            max_batch_tokens=args.max_batch_tokens,
+            concurrency=args.concurrency,
+            max_tokens=args.max_tokens,
+            raw=args.raw
+        )
         return
 
-    # Your model name from environment variables
-    model_name = os.getenv("MODEL_NAME")
+    # Get available models, unless fast start can rely on a cached validation
+    if fast:
+        problem = validation_problem(cached_config, token, endpoint_id)
+        if problem:
+            print(f"Warning: {problem}; skipping endpoint validation (fast start). Run without --fast to validate.")
+        elif model_name not in cached_config.get("available_models", []):
+            print(f"Model {model_name} was not among the endpoint's models when it was last validated: "
+                  f"{cached_config.get('available_models')}. Run without --fast to refresh.")
+            return
+        else:
+            print("Using cached endpoint validation")
+    else:
+        print("\nFetching available models...")
+        available_models = get_available_models(client)
+        if available_models:
+            print("Available models:", available_models)
+            save_cached_config(token, endpoint_id, model_name, available_models)
+        else:
+            print("No models available or couldn't fetch models.")
+            return
     
     # Test message with a simpler format
     messages = [
         {
             "role": "system",
-            "content": "You are a helpful and knowledgeable AI assistant. Answer questions accurately and concisely."
+            "content": SYSTEM_PROMPT
         },
         {
             "role": "user",
-            "content": "What is the capital of Italy?"
+            "content": args.prompt
         }
     ]
     